@@ -5,17 +5,954 @@ sys.stderr = open(os.devnull, 'w')
 
 import vlc
 import customtkinter as ctk
-from tkinter import messagebox
+import numpy as np
+from tkinter import messagebox, PhotoImage, Entry, Text
 from datetime import datetime
 import threading
 import subprocess
 import json
 import time
+import queue
+import shutil
+import errno
+import re
+import bisect
+import random
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
 CONFIG_FILE = "config.json"
 INPUT_DIR = "input"
 OUTPUT_DIR = "output"
-media_player_lock = threading.Lock()
+
+# Grading state machine, only ever touched on the Tk thread
+GRADING_IDLE = "idle"
+GRADING_PLAYING = "playing"
+GRADING_FINISHED = "finished"
+
+# Errors worth retrying (file still held open by VLC, share hiccups, etc.)
+TRANSIENT_MOVE_ERRNOS = {errno.EACCES, errno.EBUSY, errno.EAGAIN, errno.ETIMEDOUT, errno.EIO}
+COPY_CHUNK_SIZE = 8 * 1024 * 1024
+
+METADATA_INDEX_FILE = "metadata_index.json"
+RANKINGS_FILE = "rankings.jsonl"
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mkv', '.mov')
+MAX_COMPARE_VIDEOS = 5
+
+# Alternative spellings found in filenames, sidecars and MP4 tags -> canonical parameter name
+GENERATION_PARAM_ALIASES = {
+    "prompt": "prompt", "positive": "prompt", "positive_prompt": "prompt", "description": "prompt",
+    "negative": "negative_prompt", "negative_prompt": "negative_prompt",
+    "seed": "seed", "noise_seed": "seed",
+    "steps": "steps", "step": "steps", "infer_steps": "steps", "num_inference_steps": "steps",
+    "cfg": "cfg", "cfg_scale": "cfg", "guidance_scale": "cfg",
+    "guidance": "embedded_guidance", "embedded_guidance": "embedded_guidance",
+    "embedded_guidance_scale": "embedded_guidance",
+    "flow_shift": "flow_shift", "shift": "flow_shift",
+    "sampler": "sampler", "sampler_name": "sampler", "scheduler": "scheduler",
+    "width": "width", "height": "height", "fps": "fps",
+    "frames": "frames", "num_frames": "frames", "video_length": "frames", "length": "frames",
+    "model": "model", "lora": "lora",
+}
+GENERATION_PARAMS = sorted(set(GENERATION_PARAM_ALIASES.values()))
+# Sidecar keys that differ for every file by nature; they are not compared when grouping by a single parameter
+PER_FILE_PARAM_KEYS = {
+    "filename", "file", "path", "output", "output_path", "id", "uuid", "prompt_id",
+    "date", "time", "timestamp", "created", "created_at",
+}
+FILENAME_PARAM_PATTERN = re.compile(
+    r"(?<![a-z])(seed|steps|cfg|guidance|flow_shift|shift|fps|frames|length)[-=]?(\d+(?:\.\d+)?)(?![a-z])",
+    re.IGNORECASE,
+)
+FILENAME_RESOLUTION_PATTERN = re.compile(r"(?<!\d)(\d{3,4})x(\d{3,4})(?!\d)")
+DRAWTEXT_UNSAFE_CHARS = re.compile(r"[:'\\%]")
+
+# Extra renders that can share the decode of the archival comparison
+EXTRA_OUTPUTS = ("preview", "thumbnails", "difference")
+PREVIEW_HEIGHT = 360
+THUMBNAIL_HEIGHT = 480
+HLS_SEGMENT_SECONDS = 4
+# Optional local copy of hls.js (place it next to compare_vid.py); copied next to each index page
+HLS_JS_FILE = "hls.min.js"
+
+# Keyframe spacing in seconds for "scrub-friendly" renders: None keeps x264's default (up to 250 frames),
+# 0 puts a keyframe on every frame
+SHORT_GOP_SECONDS = 0.5
+KEYFRAME_MODES = {"Standard": None, "Short GOP": SHORT_GOP_SECONDS, "All-intra": 0}
+# Scrubbing only snaps to a keyframe this close; farther targets are decoded forward to exactly
+SNAP_TOLERANCE_SECONDS = 0.25
+
+# Grading canvas size; buffered clips are decoded straight to this size
+GRADING_CANVAS_WIDTH = 416
+GRADING_CANVAS_HEIGHT = 720
+LOOP_BUFFER_MAX_MB = 512
+LOOP_BUFFER_MAX_FRAMES = 600
+LOOP_BUFFER_CLIPS = 3
+
+STREAM_INDEX_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<style>
+  body {{ background: #2b2b2b; color: #ddd; font-family: Arial, sans-serif; margin: 0; text-align: center; }}
+  video {{ max-width: 100vw; max-height: 90vh; background: #000; }}
+</style>
+</head>
+<body>
+<h3>{title}</h3>
+<video id="video" controls autoplay muted playsinline></video>
+<p><a href="index.m3u8">HLS playlist</a> | <a href="{fallback}">Download MP4</a></p>
+{hls_script}
+<script>
+  var video = document.getElementById("video");
+  if (video.canPlayType("application/vnd.apple.mpegurl")) {{
+    video.src = "index.m3u8";
+  }} else if (window.Hls && Hls.isSupported() && location.protocol.indexOf("http") === 0) {{
+    // Only available when a local hls.min.js was copied next to this page
+    var hls = new Hls();
+    hls.loadSource("index.m3u8");
+    hls.attachMedia(video);
+  }} else {{
+    // Opened straight from disk or offline: the fast-start MP4 still starts instantly
+    video.src = "{fallback}";
+  }}
+</script>
+</body>
+</html>
+"""
+
+
+def copy_file_fast(src, dst):
+    """Copy a file using kernel copy offload where available, then fsync it."""
+    copied = False
+    if hasattr(os, "copy_file_range"):
+        try:
+            with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+                remaining = os.fstat(fsrc.fileno()).st_size
+                while remaining > 0:
+                    sent = os.copy_file_range(fsrc.fileno(), fdst.fileno(), min(remaining, COPY_CHUNK_SIZE))
+                    if sent == 0:
+                        break
+                    remaining -= sent
+                copied = remaining == 0
+        except OSError:
+            copied = False
+    if not copied:
+        # shutil.copyfile uses sendfile/fcopyfile/CopyFile where the platform supports it
+        shutil.copyfile(src, dst)
+    with open(dst, "r+b") as fdst:
+        os.fsync(fdst.fileno())
+    shutil.copystat(src, dst)
+
+
+def move_file(src, dst):
+    """Move a file, falling back to copy+fsync+unlink when rename can't cross filesystems."""
+    os.makedirs(os.path.dirname(dst) or ".", exist_ok=True)
+    try:
+        os.rename(src, dst)
+        return
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+
+    tmp_dst = dst + ".partial"
+    try:
+        copy_file_fast(src, tmp_dst)
+        os.replace(tmp_dst, dst)
+    except Exception:
+        if os.path.exists(tmp_dst):
+            os.remove(tmp_dst)
+        raise
+    os.remove(src)
+
+
+def build_comparison_graph(labels, frame_rate, target_height, scaled_widths, output_subdir,
+                           extra_outputs=(), thumbnail_interval=2, faststart=True, segment_seconds=None,
+                           gop=None):
+    """Build one filter_complex that decodes every input once and feeds all requested outputs.
+
+    Returns (filter_graph, output_args). The archival comparison is always
+    produced; ``extra_outputs`` may add a small preview, periodic poster
+    thumbnails and an absolute-difference stack (each input against the first).
+    ``faststart`` moves the moov atom to the front of every MP4, and
+    ``segment_seconds`` forces keyframes on segment boundaries for HLS.
+    ``gop`` caps the keyframe interval (in frames) of the comparison so
+    seeking never has to decode far; 1 makes it all-intra.
+    """
+    mp4_flags = ["-movflags", "+faststart"] if faststart else []
+    count = len(labels)
+    difference = "difference" in extra_outputs and count >= 2
+    filters = []
+    for i, label in enumerate(labels):
+        text_overlay = (
+            f"drawtext=fontfile=/path/to/font.ttf:fontsize=24:fontcolor=white:x=(w-text_w)/2:y=h-40:text='{label}'"
+            if label else "null"
+        )
+        base = f"[{i}:v]fps={frame_rate},scale=trunc(iw*{target_height}/ih/2)*2:{target_height}"
+        if difference:
+            # The first input is compared against every other one, so it needs a copy per pair
+            copies = [f"[d{i}_{k}]" for k in range(1, count)] if i == 0 else [f"[d{i}]"]
+            filters.append(f"{base},split={len(copies) + 1}[s{i}]{''.join(copies)}")
+            filters.append(f"[s{i}]{text_overlay}[v{i}]")
+        else:
+            filters.append(f"{base},{text_overlay}[v{i}]")
+
+    branches = ["main"]
+    if "preview" in extra_outputs:
+        branches.append("preview")
+    if "thumbnails" in extra_outputs:
+        branches.append("thumbs")
+
+    stack = f"{''.join(f'[v{i}]' for i in range(count))}hstack=inputs={count}"
+    if len(branches) > 1:
+        filters.append(f"{stack},split={len(branches)}{''.join(f'[{b}]' for b in branches)}")
+    else:
+        filters.append(f"{stack}[main]")
+
+    keyframe_args = ["-force_key_frames", f"expr:gte(t,n_forced*{segment_seconds})"] if segment_seconds else []
+    if gop:
+        keyframe_args += ["-g", str(gop), "-keyint_min", str(gop), "-sc_threshold", "0"]
+    output_args = [
+        "-map", "[main]", "-map", "0:a?",
+        "-c:v", "libx264", "-crf", "18", "-preset", "fast",
+        *keyframe_args, *mp4_flags,
+        os.path.join(output_subdir, "comparison.mp4"),
+    ]
+
+    if "preview" in extra_outputs:
+        filters.append(f"[preview]scale=-2:{PREVIEW_HEIGHT}[preview_out]")
+        output_args += [
+            "-map", "[preview_out]", "-map", "0:a?",
+            "-c:v", "libx264", "-crf", "28", "-preset", "veryfast", *mp4_flags,
+            os.path.join(output_subdir, "preview.mp4"),
+        ]
+
+    if "thumbnails" in extra_outputs:
+        thumbnail_dir = os.path.join(output_subdir, "thumbnails")
+        filters.append(f"[thumbs]fps=1/{thumbnail_interval},scale=-2:{THUMBNAIL_HEIGHT}[thumbs_out]")
+        output_args += [
+            "-map", "[thumbs_out]", "-q:v", "3",
+            os.path.join(thumbnail_dir, "thumb_%03d.jpg"),
+        ]
+
+    if difference:
+        diffs = []
+        for i in range(1, count):
+            filters.append(f"[d0_{i}]setsar=1,format=yuv420p[a{i}]")
+            filters.append(f"[d{i}]scale={scaled_widths[0]}:{target_height},setsar=1,format=yuv420p[b{i}]")
+            filters.append(f"[a{i}][b{i}]blend=all_mode=difference:shortest=1[diff{i}]")
+            diffs.append(f"[diff{i}]")
+        if len(diffs) > 1:
+            filters.append(f"{''.join(diffs)}hstack=inputs={len(diffs)}[diff]")
+        else:
+            filters.append(f"{diffs[0]}null[diff]")
+        output_args += [
+            "-map", "[diff]",
+            "-c:v", "libx264", "-crf", "23", "-preset", "fast", *mp4_flags,
+            os.path.join(output_subdir, "difference.mp4"),
+        ]
+
+    return ";".join(filters), output_args
+
+
+def keyframe_index_file(path):
+    return os.path.splitext(path)[0] + ".keyframes.json"
+
+
+def load_keyframe_index(path):
+    """Return the sorted keyframe times (seconds) of a video, using a cached index when it is current.
+
+    The index is built once with ffprobe from packet flags, which needs no
+    decoding, and cached next to the video.
+    """
+    signature = file_signature(path)
+    cache_file = keyframe_index_file(path)
+    if os.path.exists(cache_file):
+        try:
+            with open(cache_file, "r", encoding="utf-8") as file:
+                cached = json.load(file)
+            if cached.get("signature") == signature:
+                return cached["keyframes"]
+        except (OSError, ValueError, KeyError):
+            pass
+
+    packets_cmd = [
+        "ffprobe", "-v", "error", "-select_streams", "v:0",
+        "-show_entries", "packet=pts_time,flags", "-of", "csv=p=0", path
+    ]
+    packets_result = subprocess.run(packets_cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    keyframes = []
+    for line in packets_result.stdout.splitlines():
+        pts_time, _, flags = line.partition(",")
+        if "K" in flags:
+            try:
+                keyframes.append(float(pts_time))
+            except ValueError:
+                continue
+    keyframes.sort()
+
+    try:
+        with open(cache_file, "w", encoding="utf-8") as file:
+            json.dump({"signature": signature, "keyframes": keyframes}, file)
+    except OSError as e:
+        print(f"Failed to cache keyframe index for {path}: {e}")
+    return keyframes
+
+
+def keyframe_interval(keyframe_mode, frame_rate):
+    """Return the GOP length in frames for ``keyframe_mode`` at ``frame_rate``, or None for the encoder default."""
+    seconds = KEYFRAME_MODES.get(keyframe_mode)
+    if seconds is None:
+        return None
+    return max(int(round(frame_rate * seconds)), 1)
+
+
+def nearest_keyframe(keyframes, seconds, tolerance=SNAP_TOLERANCE_SECONDS):
+    """Return the keyframe time closest to ``seconds`` if one lies within ``tolerance``, else ``seconds`` itself."""
+    if not keyframes:
+        return seconds
+    position = bisect.bisect_left(keyframes, seconds)
+    candidates = keyframes[max(position - 1, 0):position + 1]
+    nearest = min(candidates, key=lambda keyframe: abs(keyframe - seconds))
+    return nearest if abs(nearest - seconds) <= tolerance else seconds
+
+
+def measure_seek_latency(path, duration, samples=8):
+    """Average wall-clock milliseconds for ffmpeg to decode the first frame after an accurate seek."""
+    timings = []
+    for _ in range(samples):
+        seek_cmd = [
+            "ffmpeg", "-v", "error", "-ss", f"{random.uniform(0, max(duration - 0.5, 0)):.3f}",
+            "-i", path, "-frames:v", "1", "-f", "null", "-"
+        ]
+        start = time.perf_counter()
+        subprocess.run(seek_cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        timings.append((time.perf_counter() - start) * 1000)
+    return sum(timings) / len(timings)
+
+
+def write_stream_output(output_file, segment_seconds=HLS_SEGMENT_SECONDS):
+    """Remux a finished comparison into fragmented-MP4 HLS segments plus a static index page.
+
+    This is a stream copy, so it costs no re-encode; segment boundaries come
+    from the keyframes forced during the comparison encode. Returns the path
+    of the generated index.html.
+    """
+    stream_dir = os.path.join(os.path.dirname(output_file), "stream")
+    os.makedirs(stream_dir, exist_ok=True)
+    hls_cmd = [
+        "ffmpeg", "-y", "-i", output_file,
+        "-map", "0", "-c", "copy",
+        "-f", "hls",
+        "-hls_time", str(segment_seconds),
+        "-hls_playlist_type", "vod",
+        "-hls_segment_type", "fmp4",
+        "-hls_fmp4_init_filename", "init.mp4",
+        "-hls_segment_filename", os.path.join(stream_dir, "segment_%03d.m4s"),
+        os.path.join(stream_dir, "index.m3u8"),
+    ]
+    subprocess.run(hls_cmd, check=True)
+
+    # Never load players from the network, so the page also works on offline shares
+    hls_script = ""
+    if os.path.exists(HLS_JS_FILE):
+        shutil.copyfile(HLS_JS_FILE, os.path.join(stream_dir, os.path.basename(HLS_JS_FILE)))
+        hls_script = f'<script src="{os.path.basename(HLS_JS_FILE)}"></script>'
+
+    index_file = os.path.join(stream_dir, "index.html")
+    with open(index_file, "w", encoding="utf-8") as file:
+        file.write(STREAM_INDEX_TEMPLATE.format(
+            title=os.path.basename(os.path.dirname(output_file)),
+            fallback=f"../{os.path.basename(output_file)}",
+            hls_script=hls_script,
+        ))
+    return index_file
+
+
+class DecodedClip:
+    """A short clip decoded once into canvas-sized PPM frames, looped from memory."""
+
+    def __init__(self, path, frames, width, height, frame_rate):
+        self.path = path
+        self.frames = frames
+        self.width = width
+        self.height = height
+        self.frame_rate = frame_rate
+
+    def frame_interval(self):
+        return 1 / self.frame_rate if self.frame_rate > 0 else 1 / 24
+
+    def size_bytes(self):
+        return sum(len(frame) for frame in self.frames)
+
+
+def decode_clip(path, canvas_width, canvas_height, max_bytes, max_frames):
+    """Decode a clip to RGB frames that fit the canvas, or return None if it exceeds the budget.
+
+    Raises ValueError if the clip cannot be probed or decoded.
+    """
+    info_cmd = [
+        "ffprobe", "-v", "error", "-select_streams", "v:0",
+        "-show_entries", "stream=width,height,r_frame_rate:format=duration", "-of", "json", path
+    ]
+    info_result = subprocess.run(info_cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    try:
+        info = json.loads(info_result.stdout)
+        stream = info["streams"][0]
+        numerator, _, denominator = stream["r_frame_rate"].partition("/")
+        frame_rate = float(numerator) / float(denominator or 1)
+        scale = min(canvas_width / stream["width"], canvas_height / stream["height"])
+        duration = float(info["format"]["duration"])
+    except (ValueError, KeyError, IndexError, ZeroDivisionError) as e:
+        raise ValueError(f"could not probe {path}: {e!r}")
+
+    width = max(int(stream["width"] * scale / 2) * 2, 2)
+    height = max(int(stream["height"] * scale / 2) * 2, 2)
+    frame_size = width * height * 3
+    expected_frames = int(duration * frame_rate) + 1
+    if expected_frames > max_frames or expected_frames * frame_size > max_bytes:
+        return None
+
+    decode_cmd = [
+        "ffmpeg", "-v", "error", "-i", path,
+        "-vf", f"scale={width}:{height}", "-f", "rawvideo", "-pix_fmt", "rgb24", "-"
+    ]
+    process = subprocess.Popen(decode_cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    header = f"P6 {width} {height} 255\n".encode("ascii")
+    frames = []
+    try:
+        while True:
+            data = process.stdout.read(frame_size)
+            if len(data) < frame_size:
+                break
+            frames.append(header + data)
+            # The probed duration can be off; stop as soon as the real clip blows the budget
+            if len(frames) > max_frames or len(frames) * frame_size > max_bytes:
+                process.kill()
+                return None
+    finally:
+        process.stdout.close()
+        process.wait()
+
+    if not frames:
+        raise ValueError(f"no frames decoded from {path}")
+    return DecodedClip(path, frames, width, height, frame_rate)
+
+
+class LoopBufferCache:
+    """Decodes upcoming clips on a background thread and keeps the last few in RAM.
+
+    ``max_bytes`` caps all buffered clips together; a single clip may use at
+    most half of it so the current and the next clip always fit side by side.
+    """
+
+    def __init__(self, canvas_width, canvas_height, max_bytes, max_frames, max_clips=LOOP_BUFFER_CLIPS):
+        self.canvas_width = canvas_width
+        self.canvas_height = canvas_height
+        self.max_bytes = max_bytes
+        self.max_frames = max_frames
+        self.max_clips = max_clips
+        self.clips = OrderedDict()
+        self.too_large = set()
+        self.pending = set()
+        self.wanted = set()
+        self.lock = threading.Lock()
+        self.jobs = queue.Queue()
+        self.worker = threading.Thread(target=self.run, daemon=True)
+        self.worker.start()
+
+    def prefetch(self, paths):
+        """Make ``paths`` (the current and next clip) the only clips worth decoding and queue the missing ones.
+
+        Queued clips that are no longer wanted are dropped before the worker reaches them.
+        """
+        queued = []
+        with self.lock:
+            self.wanted = set(paths)
+            self.pending &= self.wanted
+            for path in paths:
+                if path in self.clips or path in self.pending or path in self.too_large:
+                    continue
+                self.pending.add(path)
+                queued.append(path)
+        for path in queued:
+            self.jobs.put(path)
+
+    def get(self, path):
+        """Return the decoded clip if it is ready, otherwise None."""
+        with self.lock:
+            clip = self.clips.get(path)
+            if clip:
+                self.clips.move_to_end(path)
+            return clip
+
+    def discard(self, path):
+        """Forget a clip, including a queued or in-flight decode of it (e.g. once it has been moved)."""
+        with self.lock:
+            self.clips.pop(path, None)
+            self.pending.discard(path)
+            self.wanted.discard(path)
+
+    def run(self):
+        while True:
+            path = self.jobs.get()
+            with self.lock:
+                if path not in self.pending:
+                    continue
+            start = time.perf_counter()
+            try:
+                clip = decode_clip(path, self.canvas_width, self.canvas_height, self.max_bytes // 2, self.max_frames)
+            except (ValueError, OSError) as e:
+                # Possibly transient (file still being written or moved), so it may be tried again later
+                with self.lock:
+                    self.pending.discard(path)
+                print(f"Failed to buffer {path}: {e}")
+                continue
+            with self.lock:
+                # Discarded or skipped past while decoding: the frames are of no use any more
+                still_wanted = path in self.pending and path in self.wanted
+                self.pending.discard(path)
+                if not still_wanted:
+                    continue
+                if clip is None:
+                    self.too_large.add(path)
+                    print(f"Not buffering {path}: over the loop buffer budget")
+                    continue
+                self.clips[path] = clip
+                total_bytes = sum(cached.size_bytes() for cached in self.clips.values())
+                while len(self.clips) > 1 and (len(self.clips) > self.max_clips or total_bytes > self.max_bytes):
+                    _, evicted = self.clips.popitem(last=False)
+                    total_bytes -= evicted.size_bytes()
+            print(f"Buffered {len(clip.frames)} frames of {path} in {time.perf_counter() - start:.2f}s")
+
+
+class EventBus:
+    """Queue that lets any thread post events which are then dispatched on the Tk thread.
+
+    VLC fires its callbacks on its own thread, so nothing there may touch Tk
+    widgets or media players directly; callbacks post an event instead and the
+    handler runs from ``pump`` inside the Tk main loop. Identical events that
+    pile up between two pumps are coalesced into one.
+    """
+
+    def __init__(self, root, interval=15):
+        self.root = root
+        self.interval = interval
+        self.events = queue.Queue()
+        self.handlers = {}
+        self.pump()
+
+    def subscribe(self, event, handler):
+        self.handlers.setdefault(event, []).append(handler)
+
+    def post(self, event, **payload):
+        """Queue an event; safe to call from any thread."""
+        self.events.put((event, payload))
+
+    def call_soon(self, callback, *args):
+        """Run ``callback(*args)`` on the Tk thread; safe to call from any thread."""
+        self.events.put((None, {"callback": callback, "args": args}))
+
+    def pump(self):
+        pending = []
+        while True:
+            try:
+                pending.append(self.events.get_nowait())
+            except queue.Empty:
+                break
+
+        seen = set()
+        for event, payload in pending:
+            if event is None:
+                handlers = [lambda payload=payload: payload["callback"](*payload["args"])]
+            else:
+                key = (event, tuple(sorted(payload.items())))
+                if key in seen:
+                    continue
+                seen.add(key)
+                handlers = [lambda handler=handler: handler(**payload) for handler in self.handlers.get(event, [])]
+            for handler in handlers:
+                try:
+                    handler()
+                except Exception as e:
+                    print(f"Error handling {event or 'callback'}: {e}")
+
+        self.root.after(self.interval, self.pump)
+
+
+def file_signature(path):
+    """Size and mtime of a file; both survive a rename or a copy+copystat move."""
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime]
+
+
+class FileMover:
+    """Moves files on a background thread so the UI never waits on disk or network I/O."""
+
+    def __init__(self, retries=5, retry_delay=0.5):
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.jobs = queue.Queue()
+        self.lock = threading.Lock()
+        self.idle = threading.Event()
+        self.idle.set()
+        self.total = 0
+        self.done = 0
+        self.failed = []
+        self.worker = threading.Thread(target=self.run, daemon=True)
+        self.worker.start()
+
+    def move(self, src, dst):
+        """Queue a move and return immediately."""
+        with self.lock:
+            self.total += 1
+            self.idle.clear()
+        self.jobs.put((src, dst))
+
+    def is_busy(self):
+        return not self.idle.is_set()
+
+    def progress(self):
+        """Return (done, total) for the current batch."""
+        with self.lock:
+            return self.done, self.total
+
+    def pop_failures(self):
+        """Return and clear the list of (src, error) moves that gave up."""
+        with self.lock:
+            failed, self.failed = self.failed, []
+            return failed
+
+    def run(self):
+        while True:
+            batch = [self.jobs.get()]
+            # Drain whatever else is already queued so a burst of grades moves as one batch
+            while True:
+                try:
+                    batch.append(self.jobs.get_nowait())
+                except queue.Empty:
+                    break
+
+            for src, dst in batch:
+                error = self.move_with_retry(src, dst)
+                with self.lock:
+                    self.done += 1
+                    if error:
+                        self.failed.append((src, error))
+                if error:
+                    print(f"Failed to move {src}: {error}")
+                else:
+                    print(f"Moved {src} -> {dst}")
+
+            with self.lock:
+                if self.jobs.empty() and self.done >= self.total:
+                    self.done = 0
+                    self.total = 0
+                    self.idle.set()
+
+    def move_with_retry(self, src, dst):
+        """Try a move a few times, backing off on transient errors. Returns the last error or None."""
+        delay = self.retry_delay
+        for attempt in range(self.retries):
+            try:
+                move_file(src, dst)
+                return None
+            except OSError as e:
+                transient = isinstance(e, PermissionError) or e.errno in TRANSIENT_MOVE_ERRNOS
+                if not transient or attempt == self.retries - 1:
+                    return e
+                time.sleep(delay)
+                delay *= 2
+        return None
+
+
+def normalize_param_value(value):
+    """Store every parameter as a string so 6, 6.0 and "6.0" group together."""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    text = str(value).strip()
+    if not re.fullmatch(r"-?\d+(\.\d+)?", text):
+        return text
+    number = float(text)
+    return str(int(number)) if number.is_integer() else repr(number)
+
+
+def parse_filename_params(path):
+    """Pull seed/steps/cfg/... tokens such as 'seed42' or 'cfg-6.5' out of a filename."""
+    params = {}
+    stem = os.path.splitext(os.path.basename(path))[0]
+    for key, value in FILENAME_PARAM_PATTERN.findall(stem):
+        params.setdefault(GENERATION_PARAM_ALIASES[key.lower()], normalize_param_value(value))
+    resolution = FILENAME_RESOLUTION_PATTERN.search(stem)
+    if resolution:
+        params.setdefault("width", resolution.group(1))
+        params.setdefault("height", resolution.group(2))
+    return params
+
+
+def flatten_generation_params(data, params=None, top_level=True):
+    """Collect generation parameters from a (possibly nested) metadata dictionary.
+
+    Top-level scalars are kept as-is; inside nested structures (e.g. a ComfyUI
+    workflow) only keys that are known generation parameters are picked up.
+    """
+    if params is None:
+        params = {}
+    if isinstance(data, dict):
+        for key, value in data.items():
+            name = GENERATION_PARAM_ALIASES.get(str(key).lower())
+            if isinstance(value, (dict, list)):
+                flatten_generation_params(value, params, top_level=False)
+            elif value is None or value == "":
+                continue
+            elif name:
+                params.setdefault(name, normalize_param_value(value))
+            elif top_level:
+                params.setdefault(str(key).lower(), normalize_param_value(value))
+    elif isinstance(data, list):
+        for item in data:
+            flatten_generation_params(item, params, top_level=False)
+    return params
+
+
+def probe_metadata_tags(path):
+    """Read container metadata tags (title, comment, description, ...) with ffprobe."""
+    tags_cmd = ["ffprobe", "-v", "error", "-show_entries", "format_tags", "-of", "json", path]
+    tags_result = subprocess.run(tags_cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    try:
+        return json.loads(tags_result.stdout).get("format", {}).get("tags", {})
+    except ValueError:
+        return {}
+
+
+def extract_generation_params(path):
+    """Merge parameters from the filename, MP4 tags and a sidecar JSON (later sources win)."""
+    params = parse_filename_params(path)
+
+    tag_params = {}
+    for key, value in probe_metadata_tags(path).items():
+        # Tools like VideoHelperSuite store the whole prompt/workflow as JSON in a comment tag
+        try:
+            decoded = json.loads(value)
+        except (TypeError, ValueError):
+            decoded = None
+        if isinstance(decoded, (dict, list)):
+            flatten_generation_params(decoded, tag_params, top_level=False)
+        elif key.lower() in GENERATION_PARAM_ALIASES:
+            tag_params.setdefault(GENERATION_PARAM_ALIASES[key.lower()], normalize_param_value(value))
+    params.update(tag_params)
+
+    sidecar = os.path.splitext(path)[0] + ".json"
+    if os.path.exists(sidecar):
+        try:
+            with open(sidecar, "r", encoding="utf-8") as file:
+                params.update(flatten_generation_params(json.load(file)))
+        except (OSError, ValueError) as e:
+            print(f"Failed to read sidecar {sidecar}: {e}")
+    return params
+
+
+class MetadataIndex:
+    """Persistent cache of generation parameters, keyed by filename and invalidated by size/mtime."""
+
+    def __init__(self, index_file=METADATA_INDEX_FILE):
+        self.index_file = index_file
+        self.entries = {}
+        # update() runs on a worker thread while the Tk thread reads entries
+        self.lock = threading.Lock()
+        if os.path.exists(index_file):
+            try:
+                with open(index_file, "r", encoding="utf-8") as file:
+                    self.entries = json.load(file)
+            except (OSError, ValueError):
+                self.entries = {}
+
+    def save(self):
+        with self.lock:
+            with open(self.index_file, "w", encoding="utf-8") as file:
+                json.dump(self.entries, file, indent=4)
+
+    @staticmethod
+    def signature(path):
+        sidecar = os.path.splitext(path)[0] + ".json"
+        sidecar_mtime = os.stat(sidecar).st_mtime if os.path.exists(sidecar) else None
+        return file_signature(path) + [sidecar_mtime]
+
+    def update(self, paths):
+        """Extract parameters for new or changed files in parallel and persist the index.
+
+        Files that disappear in the meantime (e.g. moved by the file mover) are
+        skipped. Returns True if any entry changed.
+        """
+        stale = []
+        for path in paths:
+            try:
+                signature = self.signature(path)
+            except FileNotFoundError:
+                continue
+            with self.lock:
+                entry = self.entries.get(os.path.basename(path))
+            if not entry or entry.get("signature") != signature:
+                stale.append((path, signature))
+        if not stale:
+            return False
+
+        with ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 1)) as pool:
+            results = list(pool.map(lambda item: extract_generation_params(item[0]), stale))
+        with self.lock:
+            for (path, signature), params in zip(stale, results):
+                self.entries[os.path.basename(path)] = {"signature": signature, "params": params}
+        self.save()
+        return True
+
+    def get(self, path):
+        with self.lock:
+            return self.entries.get(os.path.basename(path), {}).get("params", {})
+
+    def param_names(self, paths):
+        return sorted({key for path in paths for key in self.get(path)})
+
+
+def find_single_param_groups(params_by_video, varying_params=GENERATION_PARAMS):
+    """Find groups of videos that share every generation parameter except one.
+
+    Returns a list of (param, videos) with at least two distinct values of
+    ``param`` per group. Each video is used at most once, since generating a
+    comparison moves its inputs into the output folder.
+    """
+    candidates = []
+    for param in varying_params:
+        others = [p for p in varying_params if p != param]
+        groups = {}
+        for video, params in params_by_video.items():
+            if param in params:
+                groups.setdefault(tuple(params.get(p) for p in others), []).append(video)
+        for videos in groups.values():
+            if len({params_by_video[video][param] for video in videos}) >= 2:
+                candidates.append((param, sorted(videos)))
+
+    # Largest sweeps first, so a clip lands in the most informative comparison
+    candidates.sort(key=lambda candidate: -len(candidate[1]))
+    jobs = []
+    used = set()
+    for param, videos in candidates:
+        # Keep one unused clip per value of the varying parameter
+        by_value = {}
+        for video in videos:
+            if video not in used:
+                by_value.setdefault(params_by_video[video][param], video)
+        ordered = [by_value[value] for value in sorted(by_value, key=param_sort_key)]
+        for start in range(0, len(ordered), MAX_COMPARE_VIDEOS):
+            chunk = ordered[start:start + MAX_COMPARE_VIDEOS]
+            if len(chunk) >= 2:
+                jobs.append((param, chunk))
+                used.update(chunk)
+    return jobs
+
+
+def param_sort_key(value):
+    """Sort numeric parameter values numerically and everything else alphabetically."""
+    try:
+        return (0, float(value), "")
+    except (TypeError, ValueError):
+        return (1, 0.0, str(value))
+
+
+class PairwiseRanker:
+    """Bradley-Terry ranking fitted from pairwise judgments.
+
+    Judgments are appended to a JSON-lines log, one per line, so recording one
+    costs the same no matter how many clips were ranked before. Clips are
+    identified by filename plus size/mtime, so a reused counter name such as
+    HunyuanVideo_00001.mp4 starts fresh while a moved clip keeps its history.
+    Only judgments between the clips being ranked are loaded into ``wins``,
+    where ``wins[i, j]`` counts how often clip i was preferred over clip j (a
+    tie counts half for each side).
+    """
+
+    def __init__(self, paths, rankings_file=RANKINGS_FILE, prior=0.1):
+        self.rankings_file = rankings_file
+        self.prior = prior
+        self.names = [os.path.basename(path) for path in paths]
+        self.ids = [self.clip_id(path) for path in paths]
+        self.wins = np.zeros((len(paths), len(paths)))
+        self.rng = np.random.default_rng()
+
+        positions = {clip_id: i for i, clip_id in enumerate(self.ids)}
+        if os.path.exists(rankings_file):
+            with open(rankings_file, "r", encoding="utf-8") as file:
+                for line in file:
+                    try:
+                        judgment = json.loads(line)
+                    except ValueError:
+                        continue
+                    i, j = positions.get(judgment.get("winner")), positions.get(judgment.get("loser"))
+                    if i is not None and j is not None:
+                        self.apply(i, j, judgment.get("tie", False))
+
+    @staticmethod
+    def clip_id(path):
+        size, mtime = file_signature(path)
+        return f"{os.path.basename(path)}|{size}|{mtime}"
+
+    def apply(self, i, j, tie):
+        if tie:
+            self.wins[i, j] += 0.5
+            self.wins[j, i] += 0.5
+        else:
+            self.wins[i, j] += 1
+
+    def record(self, winner, loser, tie=False):
+        """Record a judgment between two clip names and append it to the log."""
+        i, j = self.names.index(winner), self.names.index(loser)
+        self.apply(i, j, tie)
+        with open(self.rankings_file, "a", encoding="utf-8") as file:
+            file.write(json.dumps({"winner": self.ids[i], "loser": self.ids[j], "tie": tie}) + "\n")
+
+    def fit(self, iterations=200, tolerance=1e-8):
+        """Return log-strengths for all clips using Hunter's MM updates."""
+        count = len(self.names)
+        # A small symmetric prior keeps strengths finite for unbeaten/unplayed clips
+        wins = self.wins + self.prior * (1 - np.eye(count))
+        games = wins + wins.T
+        total_wins = wins.sum(axis=1)
+
+        strength = np.ones(count)
+        for _ in range(iterations):
+            denominator = (games / (strength[:, None] + strength[None, :])).sum(axis=1)
+            updated = total_wins / denominator
+            updated /= np.exp(np.log(updated).mean())
+            if np.abs(updated - strength).max() < tolerance:
+                strength = updated
+                break
+            strength = updated
+        return np.log(strength)
+
+    def next_pair(self):
+        """Pick the pair of clips whose outcome is most uncertain and least measured."""
+        scores = self.fit()
+        games = self.wins + self.wins.T
+        played = games.sum(axis=1)
+
+        # Win probability under the current fit; p(1-p) peaks for evenly matched clips
+        probability = 1 / (1 + np.exp(scores[None, :] - scores[:, None]))
+        uncertainty = 1 / (played[:, None] + 1) + 1 / (played[None, :] + 1)
+        information = probability * (1 - probability) * uncertainty / (1 + games)
+        information += self.rng.uniform(0, 1e-9, information.shape)  # random tie-break
+        np.fill_diagonal(information, -1)
+        i, j = np.unravel_index(np.argmax(information), information.shape)
+        return self.names[i], self.names[j]
+
+    def judgments(self):
+        return int(round(self.wins.sum()))
+
+    def ranking(self):
+        """Return [(name, score, games played)] sorted best first."""
+        scores = self.fit()
+        played = (self.wins + self.wins.T).sum(axis=1)
+        order = np.argsort(-scores)
+        return [(self.names[k], float(scores[k]), int(round(played[k]))) for k in order]
 
 
 class VideoComparerApp:
@@ -53,16 +990,24 @@ class VideoComparerApp:
         self.compare_button = ctk.CTkButton(self.sidebar, text="Generate Comparison", command=self.generate_comparisons, state="disabled")
         self.compare_button.grid(row=4, column=0, pady=5, padx=10, sticky="ew")
 
+        self.group_jobs_button = ctk.CTkButton(self.sidebar, text="Compare by Parameter", command=self.generate_group_comparisons)
+        self.group_jobs_button.grid(row=3, column=0, pady=5, padx=10, sticky="ew")
 
+        self.rank_button = ctk.CTkButton(self.sidebar, text="Rank Checked Videos", command=self.start_ranking, state="disabled")
+        self.rank_button.grid(row=5, column=0, pady=5, padx=10, sticky="ew")
 
         self.settings_button = ctk.CTkButton(self.sidebar, text="Settings", command=self.open_settings)
         self.settings_button.grid(row=6, column=0, pady=5, padx=10, sticky="ew")
 
+        # Background file move progress
+        self.move_status_label = ctk.CTkLabel(self.sidebar, text="", font=("Arial", 10))
+        self.move_status_label.grid(row=8, column=0, pady=5, padx=10, sticky="ew")
+
         # Calculate maximum button width and set sidebar width
         max_button_width = max(
             button.winfo_reqwidth() for button in [
                 self.open_input_button, self.open_output_button, 
-                self.compare_button, self.settings_button
+                self.compare_button, self.group_jobs_button, self.rank_button, self.settings_button
             ]
         ) + 20  # Add padding
         self.sidebar.configure(width=max_button_width)
@@ -93,9 +1038,29 @@ class VideoComparerApp:
         self.refresh_list_button.grid(row=3, column=0, pady=1, padx=10, sticky="ew")
 
         # Make the scrollable frame dynamically resize
-        self.video_listbox = ctk.CTkScrollableFrame(self.video_list_frame, height=500)
+        self.video_listbox = ctk.CTkScrollableFrame(self.video_list_frame, height=440)
         self.video_listbox.grid(row=2, column=0, sticky="nswe", pady=1, padx=5)
 
+        # Filter and group the list by generation parameters
+        filter_frame = ctk.CTkFrame(self.video_list_frame)
+        filter_frame.grid(row=4, column=0, pady=1, padx=10, sticky="ew")
+        filter_frame.grid_columnconfigure(0, weight=1)
+
+        self.filter_var = ctk.StringVar(value="")
+        filter_entry = ctk.CTkEntry(filter_frame, textvariable=self.filter_var, placeholder_text="Filter, e.g. seed=42 cfg!=6 cat")
+        filter_entry.grid(row=0, column=0, padx=5, pady=2, sticky="ew")
+        filter_entry.bind("<Return>", lambda event: self.populate_video_list())
+
+        ctk.CTkLabel(filter_frame, text="Group by:").grid(row=0, column=1, padx=5)
+        self.group_by_var = ctk.StringVar(value="None")
+        self.group_by_menu = ctk.CTkOptionMenu(
+            filter_frame,
+            variable=self.group_by_var,
+            values=["None"],
+            command=lambda choice: self.populate_video_list()
+        )
+        self.group_by_menu.grid(row=0, column=2, padx=5, pady=2)
+
         # Right column: Video Playback and Grading
         self.playback_frame = ctk.CTkFrame(self.root, width=300)
         self.playback_frame.grid(row=0, column=2, sticky="nwe", padx=10, pady=10)
@@ -117,16 +1082,16 @@ class VideoComparerApp:
         self.grading_progress_label.grid(row=4, column=0, pady=5)
         
         #Play Canvas
-        self.canvas = ctk.CTkCanvas(self.playback_frame, bg="#2b2b2b", height=720, width=416)
+        self.canvas = ctk.CTkCanvas(self.playback_frame, bg="#2b2b2b", height=GRADING_CANVAS_HEIGHT, width=GRADING_CANVAS_WIDTH)
         self.canvas.grid(row=2, column=0, pady=5)
 
         self.controls_frame = ctk.CTkFrame(self.playback_frame)
         self.controls_frame.grid(row=3, column=0, pady=10)
 
-        ctk.CTkButton(self.controls_frame, text="Bad", command=lambda: self.mark_video("Bad")).grid(row=0, column=0, padx=5)
-        ctk.CTkButton(self.controls_frame, text="Average", command=lambda: self.mark_video("Average")).grid(row=0, column=1, padx=5)
-        ctk.CTkButton(self.controls_frame, text="Good", command=lambda: self.mark_video("Good")).grid(row=0, column=2, padx=5)
-        ctk.CTkButton(self.controls_frame, text="Skip", command=self.skip_video).grid(row=0, column=3, padx=5)
+        ctk.CTkButton(self.controls_frame, text="Bad", command=lambda: self.post_grading_action("grade", "Bad")).grid(row=0, column=0, padx=5)
+        ctk.CTkButton(self.controls_frame, text="Average", command=lambda: self.post_grading_action("grade", "Average")).grid(row=0, column=1, padx=5)
+        ctk.CTkButton(self.controls_frame, text="Good", command=lambda: self.post_grading_action("grade", "Good")).grid(row=0, column=2, padx=5)
+        ctk.CTkButton(self.controls_frame, text="Skip", command=lambda: self.post_grading_action("skip")).grid(row=0, column=3, padx=5)
 
         # Add a label to explain the grading keys
         self.key_hint_label = ctk.CTkLabel(
@@ -137,8 +1102,16 @@ class VideoComparerApp:
         self.key_hint_label.grid(row=1, column=0, columnspan=4, pady=0)
 
         self.current_video_index = 0
+        self.videos_to_grade = []
+        self.grading_state = GRADING_IDLE
+        self.playback_generation = 0
         self.videos = []
         self.checkboxes = []
+        self.checkbox_widgets = []
+        self.metadata_index = MetadataIndex()
+        self.indexing_metadata = False
+        self.reindex_requested = False
+        self.group_jobs_running = False
         self.stop_loop = threading.Event()
         self.media_player = None
         # Initialize VLC instance based on settings
@@ -146,6 +1119,28 @@ class VideoComparerApp:
         self.quiet_mode = self.config.get("quiet_mode", True)
         self.vlc_instance = self.create_vlc_instance()
 
+        # Short clips can be decoded once and looped from RAM instead of re-opened by VLC every loop
+        self.loop_buffer_enabled = self.config.get("loop_buffer", False)
+        self.loop_buffer = LoopBufferCache(
+            GRADING_CANVAS_WIDTH,
+            GRADING_CANVAS_HEIGHT,
+            self.config.get("loop_buffer_max_mb", LOOP_BUFFER_MAX_MB) * 1024 * 1024,
+            self.config.get("loop_buffer_max_frames", LOOP_BUFFER_MAX_FRAMES),
+        )
+        self.buffer_image = None
+
+        # VLC callbacks and grading actions are funnelled through here onto the Tk thread
+        self.events = EventBus(self.root)
+        self.events.subscribe("grade", self.on_grade_event)
+        self.events.subscribe("skip", self.on_skip_event)
+        self.events.subscribe("media_end", self.on_media_end_event)
+
+        # Moves graded/compared videos off the Tk thread
+        self.file_mover = FileMover()
+        self.refresh_after_moves = False
+        self.after_moves_callbacks = []
+        self.poll_file_mover()
+
         # Initial load of video list
         self.refresh_video_list()
 
@@ -158,9 +1153,38 @@ class VideoComparerApp:
             vlc_args.append("--quiet")
         return vlc.Instance(" ".join(vlc_args))
     
+    def poll_file_mover(self):
+        """Update the move progress label, report failed moves and run work waiting on the mover."""
+        failures = self.file_mover.pop_failures()
+        if failures:
+            details = "\n".join(f"{os.path.basename(src)}: {error}" for src, error in failures)
+            messagebox.showerror("Error", f"Failed to move video(s):\n{details}")
+
+        done, total = self.file_mover.progress()
+        if self.file_mover.is_busy():
+            self.move_status_label.configure(text=f"Moving files: {done}/{total}")
+        else:
+            self.move_status_label.configure(text="")
+            callbacks, self.after_moves_callbacks = self.after_moves_callbacks, []
+            for callback in callbacks:
+                try:
+                    callback()
+                except Exception as e:
+                    messagebox.showerror("Error", f"{e}")
+            # Callbacks may have queued more moves; refresh once those have landed too
+            if self.refresh_after_moves and not self.file_mover.is_busy():
+                self.refresh_after_moves = False
+                self.refresh_video_list()
+
+        self.root.after(200, self.poll_file_mover)
+
+    def run_after_moves(self, callback):
+        """Run ``callback`` on the Tk thread once every queued move has finished."""
+        self.after_moves_callbacks.append(callback)
+
     def check_all_videos(self):
         """Check all videos in the list."""
-        for checkbox, var in zip(self.video_listbox.winfo_children(), self.checkboxes):
+        for checkbox, var in zip(self.checkbox_widgets, self.checkboxes):
             var.set("on")  # Set the variable to "on"
             checkbox.select()  # Visually select the checkbox
         self.update_button_states()  # Update button states after checking all
@@ -185,24 +1209,175 @@ class VideoComparerApp:
         """Refresh the list of videos in the input folder."""
         self.videos = [
             os.path.join(INPUT_DIR, f) for f in os.listdir(INPUT_DIR)
-            if f.lower().endswith(('.mp4', '.avi', '.mkv', '.mov'))
+            if f.lower().endswith(VIDEO_EXTENSIONS)
         ]
+        # Show the list straight away with whatever metadata is cached, then index the rest in the background
+        self.update_group_by_menu()
+        self.populate_video_list()
+        self.index_metadata()
+
+    def index_metadata(self):
+        """Extract metadata for new or changed videos on a worker thread and repopulate when done."""
+        if self.indexing_metadata:
+            self.reindex_requested = True
+            return
+        self.indexing_metadata = True
+        self.refresh_list_button.configure(text="Reading Metadata...")
+        videos = list(self.videos)
+
+        def worker():
+            try:
+                changed = self.metadata_index.update(videos)
+            except Exception as e:
+                print(f"Failed to index metadata: {e}")
+                changed = False
+            self.events.call_soon(self.on_metadata_indexed, changed)
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def on_metadata_indexed(self, changed):
+        self.indexing_metadata = False
+        self.refresh_list_button.configure(text="Refresh List")
+        if changed:
+            self.update_group_by_menu()
+            self.populate_video_list()
+        if self.reindex_requested:
+            self.reindex_requested = False
+            self.index_metadata()
+
+    def update_group_by_menu(self):
+        param_names = self.metadata_index.param_names(self.videos)
+        self.group_by_menu.configure(values=["None"] + param_names)
+        if self.group_by_var.get() not in param_names:
+            self.group_by_var.set("None")
+
+    def video_matches_filter(self, video, terms):
+        """Check a video against 'key=value', 'key!=value' and free-text filter terms."""
+        params = self.metadata_index.get(video)
+        for term in terms:
+            if "=" in term:
+                negate = "!=" in term
+                key, value = term.split("!=" if negate else "=", 1)
+                # Match the way parameters are stored: canonical key, normalized value
+                key = GENERATION_PARAM_ALIASES.get(key.lower(), key.lower())
+                matches = params.get(key, "").lower() == normalize_param_value(value).lower()
+                if matches == negate:
+                    return False
+            else:
+                haystack = " ".join([os.path.basename(video)] + list(params.values())).lower()
+                if term.lower() not in haystack:
+                    return False
+        return True
+
+    def populate_video_list(self):
+        """Rebuild the checkbox list, applying the current filter and grouping."""
+        selected = set(self.get_selected_videos())
         for widget in self.video_listbox.winfo_children():
             widget.destroy()
 
+        terms = self.filter_var.get().split()
+        visible = [video for video in self.videos if self.video_matches_filter(video, terms)]
+
+        # Only label checkboxes with the parameters that actually differ between the visible videos
+        varying = [
+            name for name in self.metadata_index.param_names(visible)
+            if name != "prompt" and len({self.metadata_index.get(v).get(name) for v in visible}) > 1
+        ]
+
+        group_by = self.group_by_var.get()
+        groups = {}
+        for video in visible:
+            key = self.metadata_index.get(video).get(group_by, "(none)") if group_by != "None" else None
+            groups.setdefault(key, []).append(video)
+
         self.checkboxes = []
-        for video in self.videos:
-            var = ctk.StringVar(value="off")
-            var.trace("w", lambda *args: self.update_button_states())  # Add a trace listener
-            checkbox = ctk.CTkCheckBox(
-                self.video_listbox,
-                text=os.path.basename(video),
-                variable=var,
-                onvalue=video,
-                offvalue="off"
-            )
-            checkbox.pack(anchor="w", pady=2)
-            self.checkboxes.append(var)
+        self.checkbox_widgets = []
+        for key in sorted(groups, key=param_sort_key):
+            if key is not None:
+                header = f"{group_by} = {key}"
+                ctk.CTkLabel(self.video_listbox, text=header[:100], font=("Arial", 12, "bold")).pack(anchor="w", pady=(6, 0))
+
+            for video in groups[key]:
+                params = self.metadata_index.get(video)
+                details = ", ".join(f"{name}={params[name]}" for name in varying if name != group_by and name in params)
+                var = ctk.StringVar(value=video if video in selected else "off")
+                var.trace("w", lambda *args: self.update_button_states())  # Add a trace listener
+                checkbox = ctk.CTkCheckBox(
+                    self.video_listbox,
+                    text=f"{os.path.basename(video)}  [{details}]" if details else os.path.basename(video),
+                    variable=var,
+                    onvalue=video,
+                    offvalue="off"
+                )
+                checkbox.pack(anchor="w", pady=2)
+                self.checkboxes.append(var)
+                self.checkbox_widgets.append(checkbox)
+
+        self.update_button_states()
+
+    def generate_group_comparisons(self):
+        """Create a comparison for every group of visible videos that differs in a single parameter."""
+        if self.group_jobs_running:
+            return
+        terms = self.filter_var.get().split()
+        visible = [video for video in self.videos if self.video_matches_filter(video, terms)]
+        # Compare every indexed key (as offered in Group by), so a clip that also differs in e.g. "vae" is not a seed sweep
+        varying_params = [
+            name for name in self.metadata_index.param_names(visible) if name not in PER_FILE_PARAM_KEYS
+        ]
+        jobs = find_single_param_groups(
+            {video: self.metadata_index.get(video) for video in visible}, varying_params=varying_params
+        )
+        if not jobs:
+            messagebox.showinfo("No Groups", "No videos differ in exactly one generation parameter.")
+            return
+
+        summary = "\n".join(f"{param}: {len(videos)} videos" for param, videos in jobs[:15])
+        if len(jobs) > 15:
+            summary += f"\n... and {len(jobs) - 15} more"
+        if not messagebox.askyesno("Compare by Parameter", f"Generate {len(jobs)} comparisons?\n\n{summary}"):
+            return
+
+        # Resolve everything that needs Tk or the index up front, then render on a worker thread
+        labelled_jobs = []
+        for param, videos in jobs:
+            values = [self.metadata_index.get(video).get(param, "") for video in videos]
+            # Keep overlay text short and free of characters that break the drawtext filter
+            labels = [f"{param}={DRAWTEXT_UNSAFE_CHARS.sub('', value)[:40]}" for value in values]
+            labelled_jobs.append((videos, labels))
+        options = {
+            "extra_outputs": self.config.get("extra_outputs", []),
+            "faststart": self.config.get("faststart", True),
+            "streaming": self.config.get("streaming", False),
+            "keyframe_mode": self.config.get("keyframe_mode", "Standard"),
+        }
+
+        self.group_jobs_running = True
+        self.group_jobs_button.configure(state="disabled")
+
+        def worker():
+            failures = []
+            for number, (videos, labels) in enumerate(labelled_jobs, start=1):
+                progress = f"Comparing {number}/{len(labelled_jobs)}..."
+                self.events.call_soon(lambda text=progress: self.group_jobs_button.configure(text=text))
+                try:
+                    output_file, _ = self.render_comparison(videos, labels, **options)
+                    if options["streaming"]:
+                        write_stream_output(output_file)
+                except Exception as e:
+                    failures.append(f"{os.path.basename(videos[0])}: {e}")
+            self.events.call_soon(self.on_group_comparisons_done, len(labelled_jobs), failures)
+
+        threading.Thread(target=worker, daemon=True).start()
+
+    def on_group_comparisons_done(self, count, failures):
+        self.group_jobs_running = False
+        self.group_jobs_button.configure(state="normal", text="Compare by Parameter")
+        self.refresh_after_moves = True
+        if failures:
+            messagebox.showerror("Error", f"{len(failures)} of {count} comparisons failed:\n" + "\n".join(failures[:10]))
+        else:
+            messagebox.showinfo("Completed", f"Generated {count} comparisons in:\n{OUTPUT_DIR}")
 
 
     def update_button_states(self):
@@ -214,6 +1389,12 @@ class VideoComparerApp:
         else:
             self.compare_button.configure(state="disabled")
 
+        # Enable rank button if at least 2 videos are selected
+        if len(selected_videos) >= 2:
+            self.rank_button.configure(state="normal")
+        else:
+            self.rank_button.configure(state="disabled")
+
         # Enable grade button if at least 1 video is selected
         if len(selected_videos) > 0:
             self.grade_button.configure(state="normal")
@@ -239,7 +1420,7 @@ class VideoComparerApp:
         # Create a modal window
         text_input_window = ctk.CTkToplevel(self.root)
         text_input_window.title("Enter Text Overlays")
-        text_input_window.geometry("650x450")
+        text_input_window.geometry("650x520")
         text_input_window.grab_set()  # Ensure the modal stays on top
 
         # Add a label for instructions
@@ -266,16 +1447,78 @@ class VideoComparerApp:
             text_inputs.append(text_var)
             ctk.CTkEntry(frame, textvariable=text_var, width=250).pack(side="right", padx=5)
 
+        # Extra renders share the decode of the comparison, so they're cheap to add here
+        extras_frame = ctk.CTkFrame(text_input_window)
+        extras_frame.pack(pady=5)
+        ctk.CTkLabel(extras_frame, text="Also render:").pack(side="left", padx=5)
+        extra_vars = {}
+        for name, text in (("preview", "Preview"), ("thumbnails", "Thumbnails"), ("difference", "Difference Video")):
+            extra_vars[name] = ctk.BooleanVar(value=name in self.config.get("extra_outputs", []))
+            ctk.CTkCheckBox(extras_frame, text=text, variable=extra_vars[name]).pack(side="left", padx=5)
+
+        # Sharing options: fast-start MP4 and segmented HLS with an index page
+        sharing_frame = ctk.CTkFrame(text_input_window)
+        sharing_frame.pack(pady=5)
+        ctk.CTkLabel(sharing_frame, text="Output:").pack(side="left", padx=5)
+        faststart_var = ctk.BooleanVar(value=self.config.get("faststart", True))
+        ctk.CTkCheckBox(sharing_frame, text="Fast-start MP4", variable=faststart_var).pack(side="left", padx=5)
+        streaming_var = ctk.BooleanVar(value=self.config.get("streaming", False))
+        ctk.CTkCheckBox(sharing_frame, text="Streaming (HLS) + index page", variable=streaming_var).pack(side="left", padx=5)
+
+        ctk.CTkLabel(sharing_frame, text="Keyframes:").pack(side="left", padx=5)
+        keyframe_mode_var = ctk.StringVar(value=self.config.get("keyframe_mode", "Standard"))
+        ctk.CTkOptionMenu(sharing_frame, variable=keyframe_mode_var, values=list(KEYFRAME_MODES), width=110).pack(side="left", padx=5)
+
         # Add a submit button at the bottom of the modal
         def on_submit():
+            extra_outputs = [name for name, var in extra_vars.items() if var.get()]
+            self.config["extra_outputs"] = extra_outputs
+            self.config["faststart"] = faststart_var.get()
+            self.config["streaming"] = streaming_var.get()
+            self.config["keyframe_mode"] = keyframe_mode_var.get()
+            self.save_config()
             text_input_window.destroy()
-            self.compare_videos(videos, text_inputs)
+            self.compare_videos(
+                videos, text_inputs, extra_outputs=extra_outputs,
+                faststart=faststart_var.get(), streaming=streaming_var.get(),
+                keyframe_mode=keyframe_mode_var.get()
+            )
 
         ctk.CTkButton(text_input_window, text="Submit", command=on_submit).pack(pady=10)
 
 
-    def compare_videos(self, videos, text_inputs):
+    def compare_videos(self, videos, text_inputs, show_player=True, extra_outputs=(), faststart=True, streaming=False,
+                       keyframe_mode="Standard"):
         """Generate a side-by-side comparison video with proper aspect ratio and labels."""
+        try:
+            output_file, output_subdir = self.render_comparison(
+                videos, [text_var.get() for text_var in text_inputs],
+                extra_outputs=extra_outputs, faststart=faststart, streaming=streaming, keyframe_mode=keyframe_mode
+            )
+        except subprocess.CalledProcessError as e:
+            messagebox.showerror("Error", f"FFmpeg error: {e}")
+            self.refresh_after_moves = True
+            return
+
+        # comparison.mp4 is already written, so a failed remux must not keep the player from opening
+        if streaming:
+            try:
+                index_file = write_stream_output(output_file)
+                print(f"Streaming output written to {index_file}")
+            except (subprocess.CalledProcessError, OSError) as e:
+                messagebox.showwarning("Warning", f"Comparison saved, but the streaming output failed: {e}")
+        if show_player:
+            self.show_video_player(output_file, videos, output_subdir, text_inputs)
+
+        self.refresh_after_moves = True  # Refresh the list once the files have been moved
+
+    def render_comparison(self, videos, labels, extra_outputs=(), faststart=True, streaming=False,
+                          keyframe_mode="Standard"):
+        """Run ffmpeg for one comparison and queue its inputs into the output folder.
+
+        Touches no Tk state, so it can run on a worker thread. Returns
+        (output_file, output_subdir); raises CalledProcessError if ffmpeg fails.
+        """
         timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
         output_subdir = os.path.join(
             OUTPUT_DIR, f"{timestamp}_{os.path.basename(videos[0])[:-4]}"
@@ -284,72 +1527,61 @@ class VideoComparerApp:
 
         output_file = os.path.join(output_subdir, "comparison.mp4")
 
-        durations = []
         frame_rates = []
         for file in videos:
-            duration_cmd = ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "default=noprint_wrappers=1:nokey=1", file]
-            duration_result = subprocess.run(duration_cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-            durations.append(float(duration_result.stdout.strip()))
-
             frame_rate_cmd = ["ffprobe", "-v", "error", "-select_streams", "v:0", "-show_entries", "stream=r_frame_rate", "-of", "default=noprint_wrappers=1:nokey=1", file]
             frame_rate_result = subprocess.run(frame_rate_cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
             frame_rate = eval(frame_rate_result.stdout.strip())
             frame_rates.append(frame_rate)
 
-        shortest_duration = min(durations)
         max_frame_rate = max(frame_rates)
-        speed_factors = [duration / shortest_duration for duration in durations]
 
-        # Add this block before generating filters to determine the minimum height among videos:
-        heights = []
+        # Determine the minimum height among videos (widths are needed to line up difference frames)
+        sizes = []
         for file in videos:
-            height_cmd = [
+            size_cmd = [
                 "ffprobe", "-v", "error", "-select_streams", "v:0",
-                "-show_entries", "stream=height", "-of", "csv=p=0", file
+                "-show_entries", "stream=width,height", "-of", "csv=p=0", file
             ]
-            height_result = subprocess.run(height_cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+            size_result = subprocess.run(size_cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
             try:
-                heights.append(int(height_result.stdout.strip()))
+                width, height = map(int, size_result.stdout.strip().split(',')[:2])
+                sizes.append((width, height))
             except ValueError:
-                heights.append(720)  # fallback height if retrieval fails
-
-        target_height = min(heights)  # Set target height to the shortest video height
-
-        # Replace the filters generation block with the following code:
-        filters = []
-        for i, (speed, text_var) in enumerate(zip(speed_factors, text_inputs)):
-            text_overlay = (
-                f",drawtext=fontfile=/path/to/font.ttf:fontsize=24:fontcolor=white:x=(w-text_w)/2:y=h-40:text='{text_var.get()}'"
-                if text_var.get() else ""
-            )
-            filters.append(
-                f"[{i}:v]fps={max_frame_rate},scale=trunc(iw*{target_height}/ih/2)*2:{target_height}"
-                f"{text_overlay}[v{i}]"
-            )
+                sizes.append((1280, 720))  # fallback size if retrieval fails
+
+        target_height = min(height for _, height in sizes)  # Set target height to the shortest video height
+        scaled_widths = [int(width * target_height / height / 2) * 2 for width, height in sizes]
+
+        filter_graph, output_args = build_comparison_graph(
+            labels,
+            max_frame_rate,
+            target_height,
+            scaled_widths,
+            output_subdir,
+            extra_outputs=extra_outputs,
+            thumbnail_interval=self.config.get("thumbnail_interval", 2),
+            faststart=faststart,
+            segment_seconds=HLS_SEGMENT_SECONDS if streaming else None,
+            gop=keyframe_interval(keyframe_mode, max_frame_rate),
+        )
 
-        filter_graph = ";".join(filters) + f";{''.join(f'[v{i}]' for i in range(len(videos)))}hstack=inputs={len(videos)}"
+        if "thumbnails" in extra_outputs:
+            os.makedirs(os.path.join(output_subdir, "thumbnails"), exist_ok=True)
 
         ffmpeg_cmd = [
             "ffmpeg",
             *[arg for video in videos for arg in ("-i", video)],
             "-filter_complex", filter_graph,
-            "-map", "0:a?",
-            "-c:v", "libx264",
-            "-crf", "18",
-            "-preset", "fast",
-            output_file
+            *output_args
         ]
 
         try:
             subprocess.run(ffmpeg_cmd, check=True)
-            self.show_video_player(output_file, videos, output_subdir, text_inputs)
-        except subprocess.CalledProcessError as e:
-            messagebox.showerror("Error", f"FFmpeg error: {e}")
-
-        for video in videos:
-            os.rename(video, os.path.join(output_subdir, os.path.basename(video)))
-        
-        self.refresh_video_list()  # Refresh the list since files have been moved
+        finally:
+            for video in videos:
+                self.file_mover.move(video, os.path.join(output_subdir, os.path.basename(video)))
+        return output_file, output_subdir
 
     def show_video_player(self, output_file, videos, output_subdir,labels):
         """Show the video player with scrubbing, notes, and a best video selection."""
@@ -443,37 +1675,85 @@ class VideoComparerApp:
         )
         duration_slider.pack(side="left", padx=5, pady=2)
 
+        # Snapping only moves a seek onto a nearby keyframe; otherwise VLC decodes forward to the exact target.
+        # Off by default: Standard renders have keyframes seconds apart, so it rarely applies there.
+        snap_var = ctk.BooleanVar(value=self.config.get("snap_to_keyframes", False))
+
+        def on_snap_toggled():
+            self.config["snap_to_keyframes"] = snap_var.get()
+            self.save_config()
+
+        ctk.CTkCheckBox(controls_frame, text="Snap to keyframes", variable=snap_var, command=on_snap_toggled).pack(side="left", padx=5, pady=2)
+
+        seek_label = ctk.CTkLabel(controls_frame, text="", font=("Arial", 10))
+
+        def measure_seek():
+            seek_label.configure(text="Measuring seek latency...")
+            duration = media_player.get_length() / 1000 or (keyframes[-1] if keyframes else 0)
+            threading.Thread(
+                target=lambda: self.events.call_soon(
+                    lambda latency: player_window.winfo_exists() and seek_label.configure(text=f"Seek: {latency:.0f} ms avg"),
+                    measure_seek_latency(output_file, duration)
+                ),
+                daemon=True
+            ).start()
+
+        ctk.CTkButton(controls_frame, text="Measure Seek", command=measure_seek, width=100).pack(side="left", padx=5, pady=2)
+        seek_label.pack(side="left", padx=5, pady=2)
+
+        keyframes = []
+
+        def on_keyframes_loaded(loaded):
+            keyframes[:] = loaded
+            if player_window.winfo_exists() and len(loaded) > 1:
+                average_gop = (loaded[-1] - loaded[0]) / (len(loaded) - 1)
+                seek_label.configure(text=f"{len(loaded)} keyframes, every {average_gop:.1f}s")
+
+        # Build (or load the cached) keyframe index without blocking the window
+        threading.Thread(
+            target=lambda: self.events.call_soon(on_keyframes_loaded, load_keyframe_index(output_file)),
+            daemon=True
+        ).start()
+
         def update_slider():
-            while True:
-                try:
-                    if not is_scrubbing.get():
-                        current_time = media_player.get_time() // 1000
-                        duration = media_player.get_length() // 1000
-                        if duration > 0:
-                            duration_slider.configure(to=duration)
-                            duration_slider.set(current_time)
-                    time.sleep(0.1)
-                except Exception:
-                    break
+            # Polled from the Tk main loop; stops once the window is gone
+            try:
+                if not player_window.winfo_exists():
+                    return
+                if not is_scrubbing.get():
+                    current_time = media_player.get_time() / 1000
+                    duration = media_player.get_length() / 1000
+                    if duration > 0:
+                        duration_slider.configure(to=duration)
+                        duration_slider.set(current_time)
+            except Exception:
+                return
+            player_window.after(100, update_slider)
 
         def on_scrub_start(event):
             is_scrubbing.set(True)
 
         def on_scrub_end(event):
             is_scrubbing.set(False)
-            scrub_time = int(duration_slider.get() * 1000)
+            scrub_seconds = duration_slider.get()
+            if snap_var.get():
+                scrub_seconds = nearest_keyframe(keyframes, scrub_seconds)
+                duration_slider.set(scrub_seconds)
             if is_at_end.get():
                 reload_media()
-            media_player.set_time(scrub_time)
+            media_player.set_time(int(scrub_seconds * 1000))
 
         duration_slider.bind("<ButtonPress-1>", on_scrub_start)
         duration_slider.bind("<ButtonRelease-1>", on_scrub_end)
 
-        def on_media_end(event):
+        def on_media_end():
             is_at_end.set(True)
-            duration_slider.set(media_player.get_length() // 1000)
+            duration_slider.set(media_player.get_length() / 1000)
 
-        media_player.event_manager().event_attach(vlc.EventType.MediaPlayerEndReached, on_media_end)
+        # VLC fires this on its own thread; hand it to the Tk thread
+        media_player.event_manager().event_attach(
+            vlc.EventType.MediaPlayerEndReached, lambda event: self.events.call_soon(on_media_end)
+        )
 
         # Best Video Checkboxes and Notes Section
         checkboxes_frame = ctk.CTkFrame(player_window)
@@ -517,14 +1797,22 @@ class VideoComparerApp:
                 with open(notes_file, "w") as file:
                     file.write(f"Best Video: {os.path.basename(selected_video)}\n")
                     file.write(f"Notes:\n{notes}")
-                
-                # Add "best-" prefix to the selected video's filename
-                selected_video_path = os.path.join(output_subdir, os.path.basename(selected_video))
-                new_video_path = os.path.join(output_subdir, f"best-{os.path.basename(selected_video)}")
+            except Exception as e:
+                messagebox.showerror("Error", f"Failed to save notes: {e}")
+                return
 
+            # Add "best-" prefix to the selected video's filename
+            selected_video_path = os.path.join(output_subdir, os.path.basename(selected_video))
+            new_video_path = os.path.join(output_subdir, f"best-{os.path.basename(selected_video)}")
+
+            def rename_best_video():
                 # Check if the video exists in the output directory
                 if os.path.exists(selected_video_path):
-                    os.rename(selected_video_path, new_video_path)
+                    try:
+                        os.rename(selected_video_path, new_video_path)
+                    except OSError as e:
+                        messagebox.showerror("Error", f"Notes saved, but failed to rename the best video: {e}")
+                        return
                     messagebox.showinfo(
                         "Saved",
                         f"Notes saved to {notes_file}.\nBest video renamed to: {os.path.basename(new_video_path)}"
@@ -535,16 +1823,22 @@ class VideoComparerApp:
                         f"The video file for '{selected_video}' was not found in the output directory. Only notes were saved."
                     )
 
-                # Close the player window after saving
-                player_window.destroy()
-            except Exception as e:
-                messagebox.showerror("Error", f"Failed to save notes: {e}")
+            # The inputs may still be on their way into the output directory
+            self.run_after_moves(rename_best_video)
+
+            # Close the player window after saving
+            player_window.destroy()
 
 
         def delete_comparison():
+            media_player.stop()
+            media_player.release()
+            player_window.destroy()
+            # The inputs may still be moving into the folder; delete it only once they have landed
+            self.run_after_moves(remove_comparison_folder)
+
+        def remove_comparison_folder():
             try:
-                media_player.stop()
-                media_player.release()
                 for root, dirs, files in os.walk(output_subdir, topdown=False):
                     for file in files:
                         os.remove(os.path.join(root, file))
@@ -552,7 +1846,6 @@ class VideoComparerApp:
                         os.rmdir(os.path.join(root, dir))
                 os.rmdir(output_subdir)
                 messagebox.showinfo("Deleted", f"Comparison folder '{output_subdir}' has been deleted.")
-                player_window.destroy()
             except Exception as e:
                 messagebox.showerror("Error", f"Failed to delete folder: {e}")
 
@@ -566,11 +1859,110 @@ class VideoComparerApp:
         delete_button.pack(side="right", padx=5)
 
         media_player.play()
-        threading.Thread(target=update_slider, daemon=True).start()
+        update_slider()
 
 
+    def start_ranking(self):
+        """Rank the checked videos by judging two clips at a time."""
+        selected_videos = self.get_selected_videos()
+        if len(selected_videos) < 2:
+            messagebox.showerror("Error", "Please select at least 2 videos to rank.")
+            return
+
+        paths = {os.path.basename(video): video for video in selected_videos}
+        ranker = PairwiseRanker(selected_videos)
+        names = ranker.names
+        # Roughly n*log2(n) judgments give a reliable order; show it as a target
+        target = int(np.ceil(len(names) * np.log2(len(names))))
+
+        ranking_window = ctk.CTkToplevel(self.root)
+        ranking_window.title("Pairwise Ranking")
+        ranking_window.geometry("900x880")
+        ranking_window.focus_set()
+
+        ctk.CTkLabel(ranking_window, text="Which clip is better?", font=("Arial", 16)).grid(row=0, column=0, columnspan=2, pady=5)
+
+        canvases = []
+        name_labels = []
+        for column in range(2):
+            canvas = ctk.CTkCanvas(ranking_window, bg="#2b2b2b", height=720, width=416)
+            canvas.grid(row=1, column=column, padx=5, pady=5)
+            canvases.append(canvas)
+            label = ctk.CTkLabel(ranking_window, text="", font=("Arial", 12))
+            label.grid(row=2, column=column)
+            name_labels.append(label)
+
+        players = [self.vlc_instance.media_player_new() for _ in canvases]
+        for player, canvas in zip(players, canvases):
+            player.set_hwnd(canvas.winfo_id())
+
+        buttons_frame = ctk.CTkFrame(ranking_window)
+        buttons_frame.grid(row=3, column=0, columnspan=2, pady=5)
+
+        progress_label = ctk.CTkLabel(ranking_window, text="", font=("Arial", 12))
+        progress_label.grid(row=4, column=0, columnspan=2, pady=2)
+
+        current_pair = []
+
+        def show_next_pair():
+            current_pair[:] = ranker.next_pair()
+            for player, label, name in zip(players, name_labels, current_pair):
+                # Loop in VLC itself so no end-of-media callbacks are needed here
+                media = self.vlc_instance.media_new(paths[name], "input-repeat=65535")
+                player.stop()
+                player.set_media(media)
+                player.play()
+                label.configure(text=name)
+            progress_label.configure(text=f"Judgments: {ranker.judgments()} (about {target} for a reliable order)")
+
+        def judge(result):
+            left, right = current_pair
+            if result == "left":
+                ranker.record(left, right)
+            elif result == "right":
+                ranker.record(right, left)
+            else:
+                ranker.record(left, right, tie=True)
+            show_next_pair()
+
+        def show_ranking():
+            results_window = ctk.CTkToplevel(ranking_window)
+            results_window.title("Current Ranking")
+            results_window.geometry("600x500")
+            results_text = ctk.CTkTextbox(results_window)
+            results_text.pack(expand=True, fill="both", padx=10, pady=10)
+            for position, (name, score, played) in enumerate(ranker.ranking(), start=1):
+                results_text.insert("end", f"{position:>3}. {name}  (score {score:+.2f}, {played} judgments)\n")
+            results_text.configure(state="disabled")
+
+        def close_ranking():
+            for player in players:
+                player.stop()
+                player.release()
+            ranking_window.destroy()
+
+        ctk.CTkButton(buttons_frame, text="Left Better", command=lambda: judge("left")).pack(side="left", padx=5)
+        ctk.CTkButton(buttons_frame, text="Tie", command=lambda: judge("tie")).pack(side="left", padx=5)
+        ctk.CTkButton(buttons_frame, text="Right Better", command=lambda: judge("right")).pack(side="left", padx=5)
+        ctk.CTkButton(buttons_frame, text="Show Ranking", command=show_ranking).pack(side="left", padx=5)
+        ctk.CTkLabel(
+            ranking_window,
+            text="Key bindings: Left Arrow = Left Better, Down Arrow = Tie, Right Arrow = Right Better",
+            font=("Arial", 10),
+        ).grid(row=5, column=0, columnspan=2, pady=0)
+
+        ranking_window.bind("<Left>", lambda event: judge("left"))
+        ranking_window.bind("<Right>", lambda event: judge("right"))
+        ranking_window.bind("<Down>", lambda event: judge("tie"))
+        ranking_window.protocol("WM_DELETE_WINDOW", close_ranking)
+
+        show_next_pair()
+
     def start_grading(self):
         """Initialize the video grading process."""
+        if self.grading_state == GRADING_FINISHED:
+            messagebox.showinfo("Busy", "The last graded videos are still being moved; try again once they have landed.")
+            return
         selected_videos = self.get_selected_videos()
         if not selected_videos:
             messagebox.showerror("Error", "No videos selected for grading.")
@@ -585,25 +1977,59 @@ class VideoComparerApp:
         self.videos_to_grade = selected_videos
         self.current_video_index = 0
         self.stop_loop.clear()
-
-        # Initialize VLC player
-        self.media_player = self.vlc_instance.media_player_new()
-        self.media_player.set_hwnd(self.canvas.winfo_id())
+        self.grading_state = GRADING_PLAYING
 
         # Bind number keypad keys and standard number keys for grading
-        self.root.bind("1", lambda event: self.mark_video("Bad"))
-        self.root.bind("<KP_1>", lambda event: self.mark_video("Bad"))
-        self.root.bind("2", lambda event: self.mark_video("Average"))
-        self.root.bind("<KP_2>", lambda event: self.mark_video("Average"))
-        self.root.bind("3", lambda event: self.mark_video("Good"))
-        self.root.bind("<KP_3>", lambda event: self.mark_video("Good"))
-        self.root.bind(".", lambda event: self.skip_video())
-        self.root.bind("<KP_Decimal>", lambda event: self.skip_video())
+        self.root.bind("1", lambda event: self.on_grading_key(event, "grade", "Bad"))
+        self.root.bind("<KP_1>", lambda event: self.on_grading_key(event, "grade", "Bad"))
+        self.root.bind("2", lambda event: self.on_grading_key(event, "grade", "Average"))
+        self.root.bind("<KP_2>", lambda event: self.on_grading_key(event, "grade", "Average"))
+        self.root.bind("3", lambda event: self.on_grading_key(event, "grade", "Good"))
+        self.root.bind("<KP_3>", lambda event: self.on_grading_key(event, "grade", "Good"))
+        self.root.bind(".", lambda event: self.on_grading_key(event, "skip"))
+        self.root.bind("<KP_Decimal>", lambda event: self.on_grading_key(event, "skip"))
+        # Take focus off the filter box so grade keys are not typed into it
+        self.root.focus_set()
         self.play_video()
 
-        self.current_video_index = 0
-        self.grading_progress_label.configure(text=f"Grading Progress: {self.current_video_index}/{len(self.videos_to_grade)}")
+    def on_grading_key(self, event, action, grade=None):
+        """Grade or skip from the keyboard, unless the key was typed into a text field such as the filter box."""
+        if isinstance(event.widget, (Entry, Text)):
+            return
+        self.post_grading_action(action, grade)
+
+    def post_grading_action(self, action, grade=None):
+        """Queue a grade or skip for the clip that is on screen right now.
+
+        The clip index travels with the event, so repeated presses that arrive
+        before the next clip is loaded are dropped instead of grading (and
+        moving) the following clip by accident.
+        """
+        payload = {"index": self.current_video_index}
+        if grade:
+            payload["grade"] = grade
+        self.events.post(action, **payload)
+
+    def is_current_clip(self, index):
+        return self.grading_state == GRADING_PLAYING and index == self.current_video_index
+
+    def on_grade_event(self, grade, index):
+        if not self.is_current_clip(index):
+            print(f"Ignoring stale grade '{grade}' for clip {index + 1}")
+            return
+        self.mark_video(grade)
+
+    def on_skip_event(self, index):
+        if not self.is_current_clip(index):
+            print(f"Ignoring stale skip for clip {index + 1}")
+            return
+        self.skip_video()
 
+    def on_media_end_event(self, generation):
+        # Events from a player that has since been replaced are stale
+        if self.grading_state != GRADING_PLAYING or generation != self.playback_generation:
+            return
+        self.restart_video()
 
     def play_video(self):
         """Play the current video."""
@@ -611,12 +2037,55 @@ class VideoComparerApp:
             self.grading_progress_label.configure(text=f"Grading Progress: {self.current_video_index + 1}/{len(self.videos_to_grade)}")
             self.current_video_path = self.videos_to_grade[self.current_video_index]
             print(f"Playing video: {self.current_video_path}")
-    
+
+            # Decode this clip and the next one ahead so switching clips costs no decode
+            if self.loop_buffer_enabled:
+                self.loop_buffer.prefetch(self.videos_to_grade[self.current_video_index:self.current_video_index + 2])
+
             # Load and play the media
-            self.load_and_play_media(self.current_video_path)
+            self.start_clip_playback(self.current_video_path)
         else:
             self.finish_grading()
 
+    def start_clip_playback(self, video_path):
+        """Loop the clip from the RAM buffer if it has been decoded, otherwise play it with VLC."""
+        clip = self.loop_buffer.get(video_path) if self.loop_buffer_enabled else None
+        if clip:
+            self.play_buffered_clip(clip)
+        else:
+            self.load_and_play_media(video_path)
+
+    def play_buffered_clip(self, clip):
+        """Show a decoded clip on the canvas, looping from memory with no disk reads or decoding."""
+        self.clear_media_player_events()
+        self.release_media_player()
+        self.playback_generation += 1
+        generation = self.playback_generation
+
+        self.buffer_image = PhotoImage(master=self.canvas, width=clip.width, height=clip.height)
+        self.canvas.delete("all")
+        self.canvas.create_image(GRADING_CANVAS_WIDTH // 2, GRADING_CANVAS_HEIGHT // 2, image=self.buffer_image)
+        print(f"Looping {clip.path} from memory ({len(clip.frames)} frames)")
+        self.show_buffered_frame(clip, generation, time.perf_counter())
+
+    def show_buffered_frame(self, clip, generation, start):
+        # A newer clip (or the end of grading) supersedes this loop
+        if generation != self.playback_generation or self.grading_state != GRADING_PLAYING:
+            return
+        interval = clip.frame_interval()
+        elapsed = time.perf_counter() - start
+        index = int(elapsed / interval)
+        # Wrap around the ring of frames; late ticks skip frames instead of drifting
+        self.buffer_image.configure(data=clip.frames[index % len(clip.frames)], format="PPM")
+        delay = (index + 1) * interval - (time.perf_counter() - start)
+        self.root.after(max(int(delay * 1000), 1), self.show_buffered_frame, clip, generation, start)
+
+    def stop_buffered_playback(self):
+        self.playback_generation += 1
+        self.buffer_image = None
+        if self.canvas:
+            self.canvas.delete("all")
+
     def clear_media_player_events(self):
         if self.media_player:
             event_manager = self.media_player.event_manager()
@@ -628,42 +2097,38 @@ class VideoComparerApp:
             self.media_player.release()
             self.media_player = None
 
-
-
-
     def load_and_play_media(self, video_path):
         """Load and start playing a video."""
         self.clear_media_player_events()
         self.release_media_player()
 
-                # Initialize VLC player
+        self.stop_buffered_playback()
+
+        # Initialize VLC player
         self.media_player = self.vlc_instance.media_player_new()
         self.media_player.set_hwnd(self.canvas.winfo_id())
 
-        with media_player_lock:
-            # Stop the player and clear any previous media
-            if self.media_player:
-                self.media_player.stop()
-                self.media_player.set_media(None)  # Release any previously loaded media
-
-            # Create a new media object and load it
-            media = self.vlc_instance.media_new(video_path)
-            self.media_player.set_media(media)
+        # Create a new media object and load it
+        media = self.vlc_instance.media_new(video_path)
+        self.media_player.set_media(media)
 
-            # Attach the MediaPlayerEndReached event
-            self.media_player.event_manager().event_attach(
-                vlc.EventType.MediaPlayerEndReached, self.restart_video
-            )
+        # VLC calls this on its own thread, so only post an event tagged with this player's generation
+        self.playback_generation += 1
+        generation = self.playback_generation
+        self.media_player.event_manager().event_attach(
+            vlc.EventType.MediaPlayerEndReached,
+            lambda event: self.events.post("media_end", generation=generation)
+        )
 
-            # Start playback
-            result = self.media_player.play()
-            if result == 0:
-                print(f"Video started successfully: {video_path}")
-            else:
-                print(f"Failed to start video. Result: {result}")
+        # Start playback
+        result = self.media_player.play()
+        if result == 0:
+            print(f"Video started successfully: {video_path}")
+        else:
+            print(f"Failed to start video. Result: {result}")
 
 
-    def restart_video(self, event=None):
+    def restart_video(self):
         """Restart the current video."""
         print("Video ended. Restarting...")
 
@@ -673,7 +2138,8 @@ class VideoComparerApp:
         if self.current_video_index < len(self.videos_to_grade):
             video_path = self.videos_to_grade[self.current_video_index]
             print(f"Restarting video: {video_path}")
-            self.load_and_play_media(video_path)
+            # Switches to the RAM loop as soon as the background decode has finished
+            self.start_clip_playback(video_path)
         else:
             print("No video to restart. Grading might be complete.")
 
@@ -681,17 +2147,15 @@ class VideoComparerApp:
     def rebuild_canvas(self):
         """Destroy and recreate the video canvas."""
         print("Rebuilding video canvas...")
+        # Detach the player first so VLC never renders into a destroyed window
+        self.clear_media_player_events()
+        self.release_media_player()
         if self.canvas:
             self.canvas.destroy()
 
-        self.canvas = ctk.CTkCanvas(self.playback_frame, bg="#2b2b2b", height=720, width=416)
+        self.canvas = ctk.CTkCanvas(self.playback_frame, bg="#2b2b2b", height=GRADING_CANVAS_HEIGHT, width=GRADING_CANVAS_WIDTH)
         self.canvas.grid(row=2, column=0, pady=5)
-
-        # Reinitialize the media player with the new canvas
-        with media_player_lock:
-            self.media_player = self.vlc_instance.media_player_new()
-            self.media_player.set_hwnd(self.canvas.winfo_id())
-        print("Canvas rebuilt and media player reattached.")
+        print("Canvas rebuilt.")
 
 
     def skip_video(self):
@@ -705,21 +2169,15 @@ class VideoComparerApp:
         """Grade the current video."""
         video_path = self.videos_to_grade[self.current_video_index]
         grade_folder = os.path.join(self.graded_folder, grade)
-        os.makedirs(grade_folder, exist_ok=True)
 
-        try:
-            # Stop and release the media player
-            with media_player_lock:
-                if self.media_player:
-                    self.media_player.stop()
-                    self.media_player.set_media(None)  # Release the media object
-
-            # Move the video to the graded folder
-            os.rename(video_path, os.path.join(grade_folder, os.path.basename(video_path)))
-            print(f"Video moved to {grade_folder}")
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to move video: {e}")
-            return
+        # Stop and release the media player so it lets go of the file
+        self.clear_media_player_events()
+        self.release_media_player()
+
+        # Queue the move to the graded folder; the mover creates the folder and retries if VLC still holds the file
+        self.loop_buffer.discard(video_path)
+        self.file_mover.move(video_path, os.path.join(grade_folder, os.path.basename(video_path)))
+        print(f"Video queued for {grade_folder}")
 
         # Proceed to the next video
         self.current_video_index += 1
@@ -729,48 +2187,71 @@ class VideoComparerApp:
 
     def finish_grading(self):
         """Finalize grading process."""
-        self.media_player.stop()
+        self.grading_state = GRADING_FINISHED
+        self.stop_buffered_playback()
+        self.clear_media_player_events()
+        self.release_media_player()
         self.grading_progress_label.configure(text="Grading Complete")  # Update label to indicate completion
         self.unbind_grading_keys()
-        messagebox.showinfo("Completed", f"All videos graded and moved to:\n{self.graded_folder}")
-        self.refresh_video_list()
+
+        # Stay finished until the queued moves have actually landed, then report completion
+        graded_folder = self.graded_folder
+
+        def on_moves_done():
+            if self.grading_state != GRADING_FINISHED:
+                return  # Cancelled in the meantime
+            self.grading_state = GRADING_IDLE
+            messagebox.showinfo("Completed", f"All videos graded and moved to:\n{graded_folder}")
+
+        self.run_after_moves(on_moves_done)
+        self.refresh_after_moves = True
 
 
     def cancel_grading(self):
         """Cancel the grading process and restore videos to the input folder."""
-        if not hasattr(self, 'graded_folder') or not os.path.exists(self.graded_folder):
+        if not getattr(self, 'graded_folder', None) or not os.path.exists(self.graded_folder):
             messagebox.showerror("Error", "No grading process to cancel.")
             return
 
-        try:
-            # Move videos back to the input folder
-            for grade_folder in os.listdir(self.graded_folder):
-                grade_path = os.path.join(self.graded_folder, grade_folder)
+        # Stop reacting to grades and player events
+        self.grading_state = GRADING_IDLE
+        self.stop_buffered_playback()
+        self.clear_media_player_events()
+        self.release_media_player()
+        self.unbind_grading_keys()
+        self.stop_loop.set()
+
+        graded_folder = self.graded_folder
+        self.current_video_index = 0
+        self.videos_to_grade = []
+        self.graded_folder = None
+
+        def restore_videos():
+            # Queue every graded video back to the input folder
+            for grade_folder in os.listdir(graded_folder):
+                grade_path = os.path.join(graded_folder, grade_folder)
                 if os.path.isdir(grade_path):
                     for video in os.listdir(grade_path):
-                        video_path = os.path.join(grade_path, video)
-                        os.rename(video_path, os.path.join(INPUT_DIR, video))
-            
-            # Delete the graded folder
-            for root, dirs, files in os.walk(self.graded_folder, topdown=False):
-                for file in files:
-                    os.remove(os.path.join(root, file))
+                        self.file_mover.move(os.path.join(grade_path, video), os.path.join(INPUT_DIR, video))
+            self.run_after_moves(remove_graded_folder)
+
+        def remove_graded_folder():
+            # Keep the folder if any restore failed, so no video is lost
+            if any(files for _, _, files in os.walk(graded_folder)):
+                messagebox.showwarning(
+                    "Warning",
+                    f"Some videos could not be restored and were left in:\n{graded_folder}"
+                )
+                return
+            for root, dirs, files in os.walk(graded_folder, topdown=False):
                 for dir in dirs:
                     os.rmdir(os.path.join(root, dir))
-            os.rmdir(self.graded_folder)
-
-            # Reset the state and UI
-            self.current_video_index = 0
-            self.videos_to_grade = []
-            self.graded_folder = None
-            self.stop_loop.set()
-            if self.media_player:
-                self.media_player.stop()
-            self.unbind_grading_keys()
-            self.refresh_video_list()
+            os.rmdir(graded_folder)
             messagebox.showinfo("Cancelled", "Grading process has been cancelled and videos restored to input folder.")
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to cancel grading: {e}")
+
+        # Let in-flight grade moves land before moving anything back
+        self.run_after_moves(restore_videos)
+        self.refresh_after_moves = True
 
     def unbind_grading_keys(self):
         """Unbind grading keys."""
@@ -788,7 +2269,7 @@ class VideoComparerApp:
         """Open the settings window."""
         settings_window = ctk.CTkToplevel(self.root)
         settings_window.title("Settings")
-        settings_window.geometry("400x300")
+        settings_window.geometry("400x360")
         
         # Ensure the settings modal stays on top and grabs focus
         settings_window.grab_set()
@@ -815,15 +2296,25 @@ class VideoComparerApp:
             variable=quiet_toggle_var
         ).pack(pady=10)
 
+        # Loop Buffer Toggle
+        loop_buffer_toggle_var = ctk.BooleanVar(value=self.loop_buffer_enabled)
+        ctk.CTkCheckBox(
+            settings_window,
+            text="Loop Short Clips from Memory While Grading",
+            variable=loop_buffer_toggle_var
+        ).pack(pady=10)
+
         # Save Button
         ctk.CTkButton(
             settings_window,
             text="Save",
-            command=lambda: self.save_settings(vlc_path_var.get(), gpu_toggle_var.get(), quiet_toggle_var.get())
+            command=lambda: self.save_settings(
+                vlc_path_var.get(), gpu_toggle_var.get(), quiet_toggle_var.get(), loop_buffer_toggle_var.get()
+            )
         ).pack(pady=20)
 
 
-    def save_settings(self, vlc_path, gpu_acceleration, quiet_mode):
+    def save_settings(self, vlc_path, gpu_acceleration, quiet_mode, loop_buffer=False):
         """Save settings and reinitialize VLC instance if needed."""
         if not os.path.exists(os.path.join(vlc_path, "libvlc.dll")):
             messagebox.showerror("Error", "Invalid VLC path. Make sure it contains 'libvlc.dll'.")
@@ -833,6 +2324,8 @@ class VideoComparerApp:
         self.config["vlc_path"] = vlc_path
         self.config["gpu_acceleration"] = gpu_acceleration
         self.config["quiet_mode"] = quiet_mode
+        self.config["loop_buffer"] = loop_buffer
+        self.loop_buffer_enabled = loop_buffer
 
         # Reinitialize VLC instance if settings changed
         if self.gpu_acceleration != gpu_acceleration or self.quiet_mode != quiet_mode:
@@ -18,6 +18,7 @@ if errorlevel 1 (
     pip install tk tkinterdnd2
     pip install python-vlc
     pip install customtkinter
+    pip install numpy
 )
 
 :: Activate virtual environment (if not already active)